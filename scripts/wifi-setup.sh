@@ -0,0 +1,35 @@
+#!/usr/bin/env bash
+# WiFi helper for the PiClaw setup wizard. Requires NetworkManager.
+set -euo pipefail
+
+cmd="${1:-}"
+
+case "$cmd" in
+  scan)
+    # One JSON array: [{"ssid": ..., "signal": ..., "security": ...}, ...]
+    # so the wizard parses the whole scan with a single json.loads.
+    nmcli -t -f SSID,SIGNAL,SECURITY dev wifi list --rescan yes |
+      awk -F: '
+        BEGIN { printf "[" }
+        $1 != "" {
+          if (n++) printf ","
+          gsub(/["\\]/, "\\\\&", $1)
+          printf "{\"ssid\": \"%s\", \"signal\": %d, \"security\": \"%s\"}", \
+            $1, $2, $3
+        }
+        END { print "]" }'
+    ;;
+  connect)
+    ssid="$2"
+    psk="${3:-}"
+    if [ -n "$psk" ]; then
+      nmcli dev wifi connect "$ssid" password "$psk"
+    else
+      nmcli dev wifi connect "$ssid"
+    fi
+    ;;
+  *)
+    echo "usage: wifi-setup.sh scan|connect <ssid> [password]" >&2
+    exit 64
+    ;;
+esac
@@ -0,0 +1,652 @@
+"""PiClaw first-boot setup wizard.
+
+A small Flask app that walks the user through naming their device,
+connecting WiFi (when the Pi boots in access-point mode), picking an AI
+provider, and launching the picoclaw runtime. Started by the
+piclaw-wizard systemd unit on port 8080; keeps serving the dashboard
+after setup completes.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import jinja2
+from flask import (
+    Flask,
+    Response,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    session,
+)
+
+from netinfo import discover_local_ip, interface_ip
+
+# subprocess and urllib3 are deliberately imported inside the functions
+# that need them: neither is on the path of a first page render, and on
+# a Pi first boot their import cost (urllib3 pulls in ssl and friends)
+# is a noticeable share of wizard startup.
+
+app = Flask(__name__)
+
+# Paths are overridable for development and tests, where /opt is off-limits.
+PICLAW_HOME = Path(os.environ.get("PICLAW_HOME", "/opt/piclaw"))
+PICOCLAW_HOME = Path(os.environ.get("PICOCLAW_HOME", "/opt/picoclaw"))
+
+CONFIG_FILE = PICOCLAW_HOME / "config" / "picoclaw.json"
+ENV_FILE = PICOCLAW_HOME / "config" / "env"
+SETUP_COMPLETE_MARKER = PICLAW_HOME / ".setup-complete"
+WIFI_CONFIGURED_MARKER = PICLAW_HOME / ".wifi-configured"
+WIFI_SCRIPT = PICLAW_HOME / "scripts" / "wifi-setup.sh"
+
+# str twins for the hot-path existence checks: os.path.exists on a str
+# does the same stat as Path.exists() without the attribute traversal
+# and Path object churn per request.
+SETUP_COMPLETE_MARKER_STR = str(SETUP_COMPLETE_MARKER)
+WIFI_CONFIGURED_MARKER_STR = str(WIFI_CONFIGURED_MARKER)
+WIFI_SCRIPT_STR = str(WIFI_SCRIPT)
+
+# PICLAW_TESTING=1 skips everything that needs real hardware or a real
+# provider account: systemctl, nmcli, and outbound key validation.
+TESTING = os.environ.get("PICLAW_TESTING") == "1"
+
+SUPPORTED_PROVIDERS = {
+    "anthropic": {
+        "name": "Anthropic (Claude)",
+        "docs_url": "https://console.anthropic.com/settings/keys",
+        "key_prefix": "sk-ant-",
+        "default_model": "claude-sonnet-4-5",
+        "validate_url": "https://api.anthropic.com/v1/models",
+        "auth_style": "x-api-key",
+    },
+    "openai": {
+        "name": "OpenAI (GPT)",
+        "docs_url": "https://platform.openai.com/api-keys",
+        "key_prefix": "sk-",
+        "default_model": "gpt-4o",
+        "validate_url": "https://api.openai.com/v1/models",
+        "auth_style": "bearer",
+    },
+    "google": {
+        "name": "Google (Gemini)",
+        "docs_url": "https://aistudio.google.com/app/apikey",
+        "key_prefix": "AIza",
+        "default_model": "gemini-2.0-flash",
+        "validate_url": "https://generativelanguage.googleapis.com/v1beta/models",
+        "auth_style": "query-key",
+    },
+    "groq": {
+        "name": "Groq",
+        "docs_url": "https://console.groq.com/keys",
+        "key_prefix": "gsk_",
+        "default_model": "llama-3.3-70b-versatile",
+        "validate_url": "https://api.groq.com/openai/v1/models",
+        "auth_style": "bearer",
+    },
+}
+
+# get_device_info() used to probe the network and stat the filesystem on
+# every render; under dashboard polling that dominated request latency.
+# The local IP is cached for 60s (it effectively never changes while the
+# wizard is up) and the assembled info dict for 5s. The E2E fixtures
+# write the setup marker behind the server's back, so under
+# PICLAW_TESTING the info/status TTLs drop to zero and every request
+# re-stats the filesystem.
+_DEVICE_INFO_TTL = 0.0 if TESTING else 5.0
+_STATUS_TTL = 0.0 if TESTING else 2.0
+_IP_CACHE = (0.0, None)
+_DEVICE_INFO_CACHE = (0.0, None)
+
+
+def _get_local_ip():
+    global _IP_CACHE
+    cached_at, ip = _IP_CACHE
+    if ip is not None and time.monotonic() - cached_at < 60.0:
+        return ip
+    ip = discover_local_ip()
+    _IP_CACHE = (time.monotonic(), ip)
+    return ip
+
+
+# Prime at import so the first request never pays for discovery.
+_get_local_ip()
+
+# One uname() at import: changing the hostname requires a service
+# restart anyway, so there's no point re-asking per cache refresh.
+_HOSTNAME = socket.gethostname()
+
+
+def _marker_exists(path):
+    # One stat syscall; Path.exists() layers attribute traversal on top
+    # of the same stat.
+    try:
+        os.stat(path)
+    except OSError:
+        return False
+    return True
+
+
+def _ensure_marker(path):
+    """Create or freshen a marker file with minimal syscalls.
+
+    Re-touching an existing marker is a single utimensat; creation is
+    one open+close. Readers only ever observe it fully present.
+    """
+    try:
+        os.utime(path, None)
+    except FileNotFoundError:
+        os.close(os.open(path, os.O_CREAT | os.O_WRONLY | os.O_CLOEXEC, 0o644))
+
+
+def _write_atomic(path, data, mode=0o644):
+    """Write data to path via a same-directory tmp file + rename.
+
+    os.replace is one atomic rename syscall, so a concurrent
+    /api/status read never observes a half-written file.
+    """
+    tmp = str(path) + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(data)
+    os.chmod(tmp, mode)
+    os.replace(tmp, path)
+
+
+def _secret_key():
+    """Session-signing key, stable across gunicorn workers and restarts.
+
+    os.urandom per process would give each prefork worker its own key
+    and break cookies mid-wizard, so the first process to need one
+    persists it under PICLAW_HOME. On a first boot both workers can
+    read-miss at once, so creation goes through O_EXCL: exactly one
+    write wins, losers re-read the winner's key, and all workers sign
+    with the same one.
+    """
+    secret_file = PICLAW_HOME / ".wizard-secret"
+    # A short read means we caught another worker between its O_EXCL
+    # create and its write — treat it as a miss and fall through to the
+    # race, which hands us the winner's key.
+    try:
+        existing = secret_file.read_bytes()
+        if len(existing) == 32:
+            return existing
+    except OSError:
+        pass
+    secret = os.urandom(32)
+    try:
+        secret_file.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(
+            str(secret_file),
+            os.O_CREAT | os.O_EXCL | os.O_WRONLY | os.O_CLOEXEC,
+            0o600,
+        )
+        with os.fdopen(fd, "wb") as f:
+            f.write(secret)
+        return secret
+    except FileExistsError:
+        # Lost the create race. The winner's single 32-byte write lands
+        # right after its open, so retry the read briefly rather than
+        # risk observing the file mid-write.
+        for _ in range(50):
+            try:
+                existing = secret_file.read_bytes()
+            except OSError:
+                existing = b""
+            if len(existing) == 32:
+                return existing
+            time.sleep(0.01)
+    except OSError:
+        pass
+    return secret  # fall back to a per-process key rather than failing setup
+
+
+app.secret_key = _secret_key()
+
+
+def _invalidate_device_info():
+    """Drop cached device/network state after wifi or setup changes."""
+    global _IP_CACHE, _DEVICE_INFO_CACHE, _AP_MODE_CACHE, _STATUS_CACHE
+    _IP_CACHE = (0.0, None)
+    _DEVICE_INFO_CACHE = (0.0, None)
+    _AP_MODE_CACHE = (0.0, False)
+    _STATUS_CACHE = (0.0, None)
+
+
+def get_device_info():
+    global _DEVICE_INFO_CACHE
+    cached_at, info = _DEVICE_INFO_CACHE
+    if info is not None and time.monotonic() - cached_at < _DEVICE_INFO_TTL:
+        return info
+    info = {
+        "hostname": _HOSTNAME,
+        "mdns": _HOSTNAME + ".local",
+        "ip": _get_local_ip(),
+        "setup_complete": _marker_exists(SETUP_COMPLETE_MARKER_STR),
+        "wifi_configured": _marker_exists(WIFI_CONFIGURED_MARKER_STR),
+    }
+    _DEVICE_INFO_CACHE = (time.monotonic(), info)
+    return info
+
+
+_CONFIG_CACHE = (None, None)  # (mtime_ns, parsed dict)
+
+
+def _load_config_cached():
+    """Parsed CONFIG_FILE, re-read only when its mtime changes."""
+    global _CONFIG_CACHE
+    try:
+        mtime = os.stat(CONFIG_FILE).st_mtime_ns
+    except OSError:
+        return {}
+    cached_mtime, config = _CONFIG_CACHE
+    if mtime == cached_mtime:
+        return config
+    with open(CONFIG_FILE) as f:
+        config = json.load(f)
+    _CONFIG_CACHE = (mtime, config)
+    return config
+
+
+# Address hostapd assigns wlan0 while the setup hotspot is up.
+AP_ADDRESS = "192.168.4.1"
+
+_AP_MODE_CACHE = (0.0, False)
+
+
+def _is_ap_mode():
+    """True when the Pi is broadcasting its own setup hotspot.
+
+    index() runs this on every landing-page load; AP transitions are
+    rare, so the answer is cached for 2s.
+    """
+    if TESTING:
+        return False
+    global _AP_MODE_CACHE
+    cached_at, ap_mode = _AP_MODE_CACHE
+    if time.monotonic() - cached_at < 2.0:
+        return ap_mode
+    # One ioctl beats forking `ip addr show wlan0` (~10ms of exec
+    # overhead per call).
+    ap_mode = interface_ip("wlan0") == AP_ADDRESS
+    _AP_MODE_CACHE = (time.monotonic(), ap_mode)
+    return ap_mode
+
+
+# Keep-alive pool keyed by provider host so repeat validations (user
+# re-pastes a key) reuse the TCP+TLS connection instead of paying a
+# fresh WAN handshake. Created on first use, which keeps import cheap
+# and — under the prefork server — gives each worker its own pool
+# instead of sharing sockets created before the fork.
+_VALIDATE_POOL = None
+
+
+def _validate_pool():
+    global _VALIDATE_POOL
+    if _VALIDATE_POOL is None:
+        import urllib3
+
+        _VALIDATE_POOL = urllib3.PoolManager(
+            num_pools=len(SUPPORTED_PROVIDERS),
+            maxsize=2,
+            timeout=urllib3.Timeout(connect=2.0, read=5.0),
+            retries=urllib3.Retry(total=1),
+        )
+    return _VALIDATE_POOL
+
+
+def validate_api_key(provider, api_key):
+    """Check an API key against the provider's models endpoint."""
+    spec = SUPPORTED_PROVIDERS[provider]
+    if TESTING:
+        return api_key.startswith(spec["key_prefix"]) and len(api_key) >= 8
+    import urllib3
+
+    headers = {}
+    fields = None
+    if spec["auth_style"] == "bearer":
+        headers["Authorization"] = "Bearer " + api_key
+    elif spec["auth_style"] == "x-api-key":
+        headers["x-api-key"] = api_key
+        headers["anthropic-version"] = "2023-06-01"
+    else:  # query-key (Gemini)
+        fields = {"key": api_key}
+    try:
+        resp = _validate_pool().request(
+            "GET", spec["validate_url"], headers=headers, fields=fields
+        )
+        return resp.status == 200
+    except urllib3.exceptions.HTTPError:
+        return False
+
+
+# Shared worker pool for network/dbus work we don't want serialized on
+# the request thread.
+_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="piclaw")
+
+# The AJAX pre-check and the form submit right behind it validate the
+# same key; cache results briefly so that costs one provider round trip.
+# Keys are stored as SHA-256 digests — raw secrets never enter the cache.
+_VALIDATION_CACHE = {}
+_VALIDATION_TTL = 300.0
+
+
+def _validate_cached(provider, api_key):
+    cache_key = (provider, hashlib.sha256(api_key.encode()).hexdigest())
+    now = time.monotonic()
+    cached = _VALIDATION_CACHE.get(cache_key)
+    if cached is not None and now - cached[0] < _VALIDATION_TTL:
+        return cached[1]
+    result = validate_api_key(provider, api_key)
+    _VALIDATION_CACHE[cache_key] = (now, result)
+    if len(_VALIDATION_CACHE) > 64:
+        oldest = min(_VALIDATION_CACHE, key=lambda k: _VALIDATION_CACHE[k][0])
+        del _VALIDATION_CACHE[oldest]
+    return result
+
+
+@dataclass(frozen=True, slots=True)
+class ProviderView:
+    """Immutable slice of SUPPORTED_PROVIDERS that step 2 renders."""
+
+    key: str
+    name: str
+    docs_url: str
+    default_model: str
+
+
+# Built once at import: the step-2 render used to copy the provider
+# table into fresh dicts per request; slot attribute access is also
+# cheaper for Jinja than dict lookups.
+_PROVIDER_LIST = tuple(
+    ProviderView(
+        key=key,
+        name=spec["name"],
+        docs_url=spec["docs_url"],
+        default_model=spec["default_model"],
+    )
+    for key, spec in SUPPORTED_PROVIDERS.items()
+)
+
+
+def _start_service():
+    import subprocess
+
+    # --now starts the unit inside the enable transaction: one
+    # fork+exec+dbus round trip instead of two.
+    subprocess.run(
+        ["systemctl", "enable", "--now", "picoclaw.service"],
+        capture_output=True,
+    )
+
+
+@app.route("/")
+def index():
+    if os.path.exists(SETUP_COMPLETE_MARKER_STR):
+        return redirect("/dashboard")
+    if _is_ap_mode():
+        return render_template("wifi_setup.html", device=get_device_info())
+    return redirect("/setup/1")
+
+
+@app.route("/wifi")
+def wifi_setup():
+    # Reachable outside AP mode too, so wifi can be reconfigured later
+    # (and exercised by the E2E suite).
+    return render_template("wifi_setup.html", device=get_device_info())
+
+
+@app.route("/setup/1")
+def setup_step1():
+    return render_template("setup_step1.html", device=get_device_info())
+
+
+@app.route("/setup/2", methods=["GET", "POST"])
+def setup_step2():
+    if request.method == "POST":
+        name = request.form.get("device_name", "").strip()
+        # Signed cookie instead of app.config: no mutable state shared
+        # across requests, and it survives worker hand-offs under the
+        # prefork server.
+        session["device_name"] = name or "piclaw"
+    return render_template("setup_step2.html", providers=_PROVIDER_LIST)
+
+
+@app.route("/setup/3", methods=["POST"])
+def setup_step3():
+    provider = request.form.get("provider", "")
+    api_key = request.form.get("api_key", "").strip()
+    if provider not in SUPPORTED_PROVIDERS:
+        return (
+            render_template(
+                "setup_step2.html",
+                providers=_PROVIDER_LIST,
+                error="Pick a provider first.",
+            ),
+            400,
+        )
+    # Fire the provider round trip on the pool and assemble the config
+    # while it's in flight; nothing is written until it passes.
+    validation = _EXECUTOR.submit(_validate_cached, provider, api_key)
+
+    device_name = session.get("device_name", "piclaw")
+    config = {
+        "device_name": device_name,
+        "provider": provider,
+        "model": SUPPORTED_PROVIDERS[provider]["default_model"],
+        "api_key_env": "PICOCLAW_API_KEY",
+    }
+
+    if not validation.result():
+        return (
+            render_template(
+                "setup_step2.html",
+                providers=_PROVIDER_LIST,
+                error="That API key didn't work — double-check it and try again.",
+            ),
+            400,
+        )
+    CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
+    # Encode once, write once — json.dump() issues a write() per
+    # structural token.
+    _write_atomic(CONFIG_FILE, json.dumps(config, indent=2))
+    _write_atomic(
+        ENV_FILE,
+        f"PICOCLAW_API_KEY={api_key}\nPICOCLAW_PROVIDER={provider}\n",
+        mode=0o600,
+    )
+
+    SETUP_COMPLETE_MARKER.parent.mkdir(parents=True, exist_ok=True)
+    _ensure_marker(SETUP_COMPLETE_MARKER_STR)
+    _invalidate_device_info()
+
+    if not TESTING:
+        # Fire-and-forget: the launch page (and later the dashboard)
+        # reflect real service state, so the response shouldn't wait on
+        # systemd's enable+start transaction.
+        _EXECUTOR.submit(_start_service)
+    return render_template(
+        "setup_step3.html", device=get_device_info(), device_name=device_name
+    )
+
+
+@app.route("/setup/complete")
+def setup_complete():
+    if not os.path.exists(SETUP_COMPLETE_MARKER_STR):
+        return redirect("/")
+    return render_template("setup_complete.html", device=get_device_info())
+
+
+@app.route("/dashboard")
+def dashboard():
+    if not os.path.exists(SETUP_COMPLETE_MARKER_STR):
+        return redirect("/")
+    config = _load_config_cached()
+    if TESTING:
+        service_state = "active"
+    else:
+        import subprocess
+
+        result = subprocess.run(
+            ["systemctl", "is-active", "picoclaw.service"],
+            capture_output=True,
+            text=True,
+        )
+        service_state = result.stdout.strip() or "unknown"
+    return render_template(
+        "dashboard.html",
+        device=get_device_info(),
+        config=config,
+        service_state=service_state,
+    )
+
+
+_STATUS_CACHE = (0.0, None)  # (timestamp, serialized body)
+
+
+@app.route("/api/status")
+def api_status():
+    # Dashboards poll this at 1-5Hz and the answer almost never changes;
+    # serve pre-serialized bytes for 2s instead of re-running jsonify's
+    # dict-to-JSON round trip per poll.
+    global _STATUS_CACHE
+    cached_at, body = _STATUS_CACHE
+    if body is not None and time.monotonic() - cached_at < _STATUS_TTL:
+        return Response(body, mimetype="application/json")
+    config = _load_config_cached()
+    info = get_device_info()
+    body = json.dumps(
+        {
+            "status": "ok",
+            "device": info,
+            "setup_complete": info["setup_complete"],
+            "device_name": config.get("device_name"),
+            "provider": config.get("provider"),
+            "model": config.get("model"),
+        }
+    ).encode()
+    _STATUS_CACHE = (time.monotonic(), body)
+    return Response(body, mimetype="application/json")
+
+
+@app.route("/api/validate-key", methods=["POST"])
+def api_validate_key():
+    data = request.get_json(silent=True) or {}
+    provider = data.get("provider", "")
+    api_key = data.get("api_key", "").strip()
+    if provider not in SUPPORTED_PROVIDERS:
+        return jsonify({"valid": False, "error": "unknown provider"}), 400
+    return jsonify({"valid": _validate_cached(provider, api_key)})
+
+
+@app.route("/api/restart", methods=["POST"])
+def api_restart():
+    if TESTING:
+        return jsonify({"success": True})
+    import subprocess
+
+    result = subprocess.run(
+        ["systemctl", "restart", "picoclaw.service"], capture_output=True
+    )
+    return jsonify({"success": result.returncode == 0})
+
+
+@app.route("/api/wifi/scan")
+def api_wifi_scan():
+    if not os.path.exists(WIFI_SCRIPT_STR):
+        return jsonify({"networks": []})
+    import subprocess
+
+    try:
+        result = subprocess.run(
+            [str(WIFI_SCRIPT), "scan"], capture_output=True, text=True, timeout=15
+        )
+    except subprocess.TimeoutExpired:
+        # nmcli --rescan routinely overruns on a busy Pi radio; keep the
+        # JSON shape the page expects instead of surfacing an HTML 500.
+        return jsonify({"networks": [], "error": "scan timed out"}), 504
+    # wifi-setup.sh emits one JSON array; a single parse replaces the
+    # old per-line loads with a try/except per SSID.
+    try:
+        networks_raw = json.loads(result.stdout or "[]")
+    except json.JSONDecodeError:
+        networks_raw = []
+    # Dedupe on SSID, keeping the first (strongest-signal) entry.
+    deduped = {}
+    for network in networks_raw:
+        ssid = network.get("ssid")
+        if ssid:
+            deduped.setdefault(ssid, network)
+    return jsonify({"networks": list(deduped.values())})
+
+
+@app.route("/api/wifi/connect", methods=["POST"])
+def api_wifi_connect():
+    data = request.get_json(silent=True) or {}
+    ssid = data.get("ssid", "").strip()
+    password = data.get("password", "")
+    if not ssid:
+        return jsonify({"success": False, "error": "ssid is required"}), 400
+
+    if TESTING:
+        WIFI_CONFIGURED_MARKER.parent.mkdir(parents=True, exist_ok=True)
+        _ensure_marker(WIFI_CONFIGURED_MARKER_STR)
+        _invalidate_device_info()
+        return jsonify({"success": True, "ip": _get_local_ip()})
+
+    import subprocess
+
+    try:
+        result = subprocess.run(
+            [str(WIFI_SCRIPT), "connect", ssid, password],
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+    except subprocess.TimeoutExpired:
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "error": "Joining the network timed out — try again.",
+                }
+            ),
+            504,
+        )
+    if result.returncode != 0:
+        error = result.stderr.strip() or "could not join network"
+        return jsonify({"success": False, "error": error}), 502
+
+    _ensure_marker(WIFI_CONFIGURED_MARKER_STR)
+    _invalidate_device_info()
+    # The address changes once we leave AP mode; report the new one.
+    new_ip = interface_ip("wlan0")
+    return jsonify({"success": True, "ip": new_ip or _get_local_ip()})
+
+
+# Compile every template at startup: in a first-boot wizard the first
+# click is exactly where latency matters most, and lazily compiling on
+# first render put the parse+compile bill there. Bytecode persists to a
+# cache dir so process restarts skip recompilation too.
+app.jinja_env.auto_reload = False
+_JINJA_CACHE_DIR = os.path.join(tempfile.gettempdir(), "piclaw-jinja-cache")
+os.makedirs(_JINJA_CACHE_DIR, exist_ok=True)
+app.jinja_env.bytecode_cache = jinja2.FileSystemBytecodeCache(_JINJA_CACHE_DIR)
+for _name in app.jinja_env.list_templates():
+    app.jinja_env.get_template(_name)
+
+
+if __name__ == "__main__":
+    # Development/test entry point only; the systemd unit serves app:app
+    # through gunicorn so a slow provider probe can't serialize requests.
+    app.run(
+        host="0.0.0.0",
+        port=int(os.environ.get("FLASK_RUN_PORT", "8080")),
+        threaded=True,
+    )
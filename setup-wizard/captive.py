@@ -0,0 +1,32 @@
+"""Captive portal served while the Pi is in access-point mode.
+
+hostapd + dnsmasq steer every HTTP request here until WiFi credentials
+are saved; once the Pi joins a network this process exits and the main
+wizard on port 8080 takes over.
+"""
+
+import socket
+
+from flask import Flask, render_template
+
+from netinfo import discover_local_ip, interface_ip
+
+app = Flask(__name__)
+
+
+def get_device_info():
+    hostname = socket.gethostname()
+    # In AP mode wlan0 holds the hotspot address; fall back to the
+    # default-route lookup if we're somehow already on a network.
+    ip = interface_ip("wlan0") or discover_local_ip()
+    return {"hostname": hostname, "mdns": hostname + ".local", "ip": ip}
+
+
+@app.route("/", defaults={"path": ""})
+@app.route("/<path:path>")
+def portal(path):
+    return render_template("wifi_setup.html", device=get_device_info())
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=80)
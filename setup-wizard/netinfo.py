@@ -0,0 +1,47 @@
+"""Low-level network lookups shared by the wizard and captive portal.
+
+Everything here is a single /proc read or ioctl — no subprocesses and
+no traffic leaves the machine.
+"""
+
+import fcntl
+import socket
+import struct
+
+SIOCGIFADDR = 0x8915
+
+
+def default_interface():
+    """Name of the interface carrying the default route."""
+    try:
+        with open("/proc/net/route") as f:
+            for line in f.readlines()[1:]:
+                fields = line.split()
+                if fields[1] == "00000000":  # destination 0.0.0.0/0
+                    return fields[0]
+    except OSError:
+        pass
+    return None
+
+
+def interface_ip(ifname):
+    """IPv4 address of ifname via a single SIOCGIFADDR ioctl."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        packed = struct.pack("256s", ifname[:15].encode())
+        addr = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, packed)[20:24]
+        return socket.inet_ntoa(addr)
+    except OSError:
+        return None
+    finally:
+        sock.close()
+
+
+def discover_local_ip():
+    """Primary IPv4 address: one /proc read plus one ioctl."""
+    ifname = default_interface()
+    if ifname:
+        ip = interface_ip(ifname)
+        if ip:
+            return ip
+    return "127.0.0.1"
@@ -0,0 +1,474 @@
+"""Fixtures for the setup-wizard E2E suite.
+
+Run with:  pytest -n auto --dist loadscope tests/test_e2e.py
+
+Each pytest-xdist worker gets its own Flask port and its own state
+directory under /tmp, so parallel workers never race on the shared
+config/marker files the wizard writes. --dist loadscope keeps each test
+class on one worker, preserving the in-class ordering the setup-flow
+tests rely on.
+"""
+
+import http.client
+import json
+import os
+import queue
+import re
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+import requests
+from playwright.sync_api import expect, sync_playwright
+from requests.adapters import HTTPAdapter
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SCREENSHOTS_DIR = REPO_ROOT / "screenshots"
+
+# PNG encoding costs 50-150ms per capture; keep it off the CI fast
+# path unless someone actually wants the gallery. "on-failure" grabs a
+# cheap JPEG diagnostic only when a test fails.
+_SHOT_MODE = "off"
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--screenshot-mode",
+        choices=("off", "on-failure", "always"),
+        # PICLAW_E2E_SCREENSHOTS=1 is the pre-CLI spelling of "always".
+        default=(
+            "always"
+            if os.environ.get("PICLAW_E2E_SCREENSHOTS", "0") == "1"
+            else "off"
+        ),
+        help="capture wizard screenshots: off, on test failure, or always",
+    )
+
+# Full path strings built once at import; unknown names are memoized on
+# first use.
+SHOTS = {
+    name: str(SCREENSHOTS_DIR / name)
+    for name in (
+        "01-redirect-to-setup.png",
+        "02-step1-welcome.png",
+        "03-step2-providers.png",
+        "04-provider-grid.png",
+        "05-provider-selected.png",
+        "06-launching.png",
+        "07-all-set.png",
+        "08-dashboard.png",
+        "09-loading-state.png",
+        "resp-step1-mobile.png",
+        "resp-step1-tablet.png",
+        "resp-step1-desktop.png",
+        "resp-step2-mobile.png",
+        "resp-step2-tablet.png",
+        "resp-step2-desktop.png",
+    )
+}
+
+
+def shot(page, name):
+    if _SHOT_MODE == "always":
+        try:
+            path = SHOTS[name]
+        except KeyError:
+            path = SHOTS[name] = str(SCREENSHOTS_DIR / name)
+        page.screenshot(path=path)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    outcome = yield
+    rep = outcome.get_result()
+    if rep.when != "call" or not rep.failed or _SHOT_MODE == "off":
+        return
+    # JPEG encodes ~5x faster than PNG; good enough for diagnostics.
+    for name in ("page", "step2_page", "resp_page"):
+        page = item.funcargs.get(name)
+        if page is not None:
+            SCREENSHOTS_DIR.mkdir(exist_ok=True)
+            try:
+                page.screenshot(
+                    path=str(SCREENSHOTS_DIR / f"failed-{item.name}.jpg"),
+                    type="jpeg",
+                    quality=60,
+                )
+            except Exception:
+                pass  # never let diagnostics mask the real failure
+            break
+
+# Per-worker port and state root: gw0 -> 8090, gw1 -> 8091, ...
+WORKER = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+FLASK_PORT = 8090 + int(WORKER.lstrip("gw") or 0)
+
+STATE_ROOT = Path(f"/tmp/piclaw-{WORKER}")
+PICLAW_HOME = STATE_ROOT / "piclaw"
+PICOCLAW_HOME = STATE_ROOT / "picoclaw"
+OPT_DIRS = [PICLAW_HOME, PICOCLAW_HOME, PICOCLAW_HOME / "config"]
+
+CONFIG_PATH = PICOCLAW_HOME / "config" / "picoclaw.json"
+ENV_PATH = PICOCLAW_HOME / "config" / "env"
+SETUP_MARKER = PICLAW_HOME / ".setup-complete"
+FLASK_LOG = STATE_ROOT / "flask.log"
+
+# Known-good artifacts for a completed setup. The wizard writes the
+# config deterministically (fixed key order, indent=2, no timestamps),
+# so the byte layout can be precomputed and compared without parsing.
+EXPECTED_CONFIG = {
+    "device_name": "test-claw",
+    "provider": "anthropic",
+    "model": "claude-sonnet-4-5",
+    "api_key_env": "PICOCLAW_API_KEY",
+}
+EXPECTED_CONFIG_BYTES = json.dumps(EXPECTED_CONFIG, indent=2).encode()
+EXPECTED_ENV = "PICOCLAW_API_KEY=sk-ant-test12345678\nPICOCLAW_PROVIDER=anthropic\n"
+
+# Config reads are cached on mtime_ns (the same scheme app.py uses for
+# its dashboard reads), so repeated verifications against an unchanged
+# file skip the read entirely — and never race a concurrent rewrite by
+# the wizard into a torn parse.
+_CONFIG_CACHE = (None, b"")
+
+
+def read_config_bytes():
+    global _CONFIG_CACHE
+    mtime_ns = os.stat(CONFIG_PATH).st_mtime_ns
+    if _CONFIG_CACHE[0] != mtime_ns:
+        with open(CONFIG_PATH, "rb") as f:
+            _CONFIG_CACHE = (mtime_ns, f.read())
+    return _CONFIG_CACHE[1]
+
+
+def _ensure_dirs():
+    # Skip the mkdir syscalls entirely on repeat runs where the tree
+    # already exists; parents=True covers nested state dirs in one call.
+    for d in OPT_DIRS:
+        if not os.path.isdir(d):
+            d.mkdir(parents=True, exist_ok=True)
+    if _SHOT_MODE == "always" and not os.path.isdir(SCREENSHOTS_DIR):
+        SCREENSHOTS_DIR.mkdir(exist_ok=True)
+
+
+@pytest.fixture(scope="session")
+def setup_dirs():
+    _ensure_dirs()
+    yield
+    for path in (CONFIG_PATH, ENV_PATH, SETUP_MARKER):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+_RUNNING_ON = re.compile(rb"Running on http")
+
+
+def _log_tail(limit=2048):
+    """Last bytes of the wizard's stderr log, for failure messages —
+    "Address already in use" in the log is far more actionable than a
+    bare timeout."""
+    try:
+        return FLASK_LOG.read_bytes()[-limit:].decode(errors="replace")
+    except OSError:
+        return "<no log file>"
+
+
+def _wait_for_server(proc, timeout=10.0):
+    """Block until the wizard is serving requests.
+
+    Werkzeug announces readiness on stderr, which goes to a log file
+    (a file write never backpressures the server the way an undrained
+    pipe would). Tail the file for the "Running on" banner, then probe
+    the TCP port directly — the kernel answers connect_ex as soon as
+    the socket is bound, before the HTTP stack would respond — and
+    finish with a single confirmation GET.
+    """
+    deadline = time.monotonic() + timeout
+    announced = False
+    delay = 0.01
+    while time.monotonic() < deadline:
+        try:
+            with open(FLASK_LOG, "rb") as f:
+                if _RUNNING_ON.search(f.read()):
+                    announced = True
+                    break
+        except FileNotFoundError:
+            pass
+        time.sleep(delay)
+        delay = min(0.1, delay * 1.5)
+    if not announced:
+        proc.terminate()
+        pytest.fail(
+            f"Flask server never announced itself on port {FLASK_PORT}\n"
+            f"--- {FLASK_LOG} ---\n{_log_tail()}"
+        )
+
+    # Stage 1: raw connect probe. A bare SYN/accept round-trip is
+    # cheaper than an HTTP request and succeeds the instant the listen
+    # socket is up, so this tight loop detects readiness tens of
+    # milliseconds before HTTP polling would.
+    deadline = time.monotonic() + 2.0
+    accepting = False
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            s.settimeout(0.05)
+            if s.connect_ex(("127.0.0.1", FLASK_PORT)) == 0:
+                accepting = True
+                break
+        time.sleep(0.01)
+    if not accepting:
+        proc.terminate()
+        pytest.fail(
+            f"Flask server announced but never served on port {FLASK_PORT}\n"
+            f"--- {FLASK_LOG} ---\n{_log_tail()}"
+        )
+
+    # Stage 2: one HTTP confirmation — the port accepting does not yet
+    # prove the WSGI app is wired up and answering.
+    conn = http.client.HTTPConnection("localhost", FLASK_PORT, timeout=2.0)
+    try:
+        conn.request("GET", "/api/status")
+        resp = conn.getresponse()
+        resp.read()
+        if resp.status == 200:
+            return
+    except OSError:
+        pass
+    finally:
+        conn.close()
+    proc.terminate()
+    pytest.fail(
+        f"Flask server accepted connections but /api/status failed on port"
+        f" {FLASK_PORT}\n--- {FLASK_LOG} ---\n{_log_tail()}"
+    )
+
+
+def _spawn_flask():
+    app_path = REPO_ROOT / "setup-wizard" / "app.py"
+    venv_python = REPO_ROOT / ".venv" / "bin" / "python"
+    python = str(venv_python) if venv_python.exists() else sys.executable
+
+    env = os.environ.copy()
+    env.update(
+        PICLAW_TESTING="1",
+        PICLAW_HOME=str(PICLAW_HOME),
+        PICOCLAW_HOME=str(PICOCLAW_HOME),
+        FLASK_RUN_PORT=str(FLASK_PORT),
+    )
+    # No pipes: an undrained pipe would block Flask once the 64KB
+    # kernel buffer fills. stdout is noise; stderr goes to a per-worker
+    # log file that the readiness tail reads and that survives the run
+    # for diagnostics.
+    with open(FLASK_LOG, "wb") as log:
+        return subprocess.Popen(
+            [python, str(app_path)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=log,
+        )
+
+
+@pytest.fixture(scope="session")
+def flask_server(request, setup_dirs):
+    # Launched in pytest_sessionstart; teardown lives in
+    # pytest_sessionfinish.
+    return request.config._flask_proc
+
+
+@pytest.fixture(scope="session")
+def flask_url(flask_server):
+    return f"http://localhost:{FLASK_PORT}"
+
+
+@pytest.fixture(scope="session")
+def http_session(flask_url):
+    """requests.Session for JSON-API tests; the browser is only worth
+    paying for when the assertion is about the DOM."""
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def reset_setup_state(setup_dirs):
+    """Return the wizard to the fresh-device state (no config, no
+    marker). The exists-check keeps repeat resets syscall-free."""
+    for path in (CONFIG_PATH, SETUP_MARKER):
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+@pytest.fixture
+def setup_complete(setup_dirs):
+    """Put the wizard into the post-setup state directly.
+
+    Tests that only read the configured device (dashboard, status API)
+    get the artifacts written here instead of depending on
+    test_full_setup_flow having run first, so they survive reordering
+    and xdist sharding.
+    """
+    CONFIG_PATH.write_bytes(EXPECTED_CONFIG_BYTES)
+    ENV_PATH.write_text(EXPECTED_ENV)
+    os.chmod(ENV_PATH, 0o600)
+    SETUP_MARKER.touch()
+
+
+# --single-process/--no-zygote would collapse the helper processes
+# further but are known to break pages that use workers; left out until
+# proven stable on the Pi runners.
+_LAUNCH_ARGS = [
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-renderer-backgrounding",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-features=Translate,BackForwardCache,MediaRouter",
+    "--mute-audio",
+    "--no-first-run",
+    "--no-default-browser-check",
+]
+
+# browser_context is session-scoped, so a worker only ever checks out
+# one context — a bigger pool just pre-warms contexts that are never
+# used. Raise PICLAW_E2E_CONTEXTS only if class/function-scoped
+# consumers that overlap checkouts get added.
+_POOL_SIZE = int(os.environ.get("PICLAW_E2E_CONTEXTS", "1"))
+
+
+def pytest_configure(config):
+    global _SHOT_MODE
+    _SHOT_MODE = config.getoption("--screenshot-mode")
+    # Everything here is localhost against server-rendered pages; if an
+    # expect() hasn't settled in 1.5s something is broken, and failing
+    # fast beats burning the 30s default per assertion. Genuinely slow
+    # paths (the meta-refresh wait in the full flow) carry their own
+    # explicit timeouts.
+    expect.set_options(timeout=1_500)
+
+
+def pytest_sessionstart(session):
+    """Start the wizard and Chromium with their cold starts overlapped.
+
+    Popen returns as soon as the interpreter is forked, so the Flask
+    boot proceeds in the background while Chromium launches and the
+    context pool fills; only then do we block on server readiness —
+    usually a no-op by that point. Contexts live for the whole session,
+    keeping HTTP and JS-compile caches warm across tests.
+    """
+    config = session.config
+    if config.option.collectonly:
+        return
+    if not hasattr(config, "workerinput") and config.getoption("dist", "no") != "no":
+        return  # xdist controller runs no tests itself
+
+    _ensure_dirs()
+    # An aborted previous session skips setup_dirs teardown and leaves
+    # config/marker files behind, which would bounce the suite's first
+    # redirect test to /dashboard. Start every session from the
+    # fresh-device state, before the wizard ever stats it.
+    for path in (CONFIG_PATH, ENV_PATH, SETUP_MARKER):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    config._flask_proc = _spawn_flask()
+
+    # If Playwright startup raises we never reach pytest_sessionfinish
+    # (pytest aborts with INTERNALERROR), so reap the wizard here or it
+    # leaks and squats on the port for every subsequent run.
+    try:
+        config._pw = sync_playwright().start()
+        config._browser = config._pw.chromium.launch(
+            headless=True, args=_LAUNCH_ARGS
+        )
+        pool = queue.Queue()
+        for _ in range(_POOL_SIZE):
+            pool.put(
+                config._browser.new_context(viewport={"width": 400, "height": 800})
+            )
+        config._browser_pool = pool
+    except BaseException:
+        config._flask_proc.terminate()
+        config._flask_proc.wait(timeout=5)
+        raise
+
+    _wait_for_server(config._flask_proc)
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    proc = getattr(config, "_flask_proc", None)
+    if proc is not None:
+        proc.terminate()
+        proc.wait(timeout=5)
+    browser = getattr(config, "_browser", None)
+    if browser is not None:
+        while not config._browser_pool.empty():
+            config._browser_pool.get_nowait().close()
+        browser.close()
+        config._pw.stop()
+
+
+@pytest.fixture(scope="session")
+def browser_context(request):
+    pool = request.config._browser_pool
+    context = pool.get()
+    yield context
+    context.clear_cookies()
+    pool.put(context)
+
+
+@pytest.fixture(scope="session")
+def page(browser_context):
+    # One page for the whole session: creating/destroying a Chromium
+    # target per test costs an IPC round-trip each way. Per-test state
+    # is wiped by _reset_page instead.
+    page = browser_context.new_page()
+    yield page
+    page.close()
+
+
+@pytest.fixture(autouse=True)
+def _reset_page(request):
+    if "page" not in request.fixturenames:
+        return
+    page = request.getfixturevalue("page")
+    page.context.clear_cookies()
+    if page.url.startswith("http"):
+        page.evaluate("() => { localStorage.clear(); sessionStorage.clear(); }")
+
+
+# Read-only step-2 tests share one pre-navigated page: resetting the
+# DOM with a single evaluate is much cheaper than a fresh goto/render.
+_STEP2_RESET_JS = """() => {
+    document.querySelectorAll('.provider-card.selected')
+        .forEach(c => c.classList.remove('selected'));
+    document.getElementById('provider').value = '';
+    document.getElementById('api_key').value = '';
+    document.getElementById('apiKeySection').hidden = true;
+    document.getElementById('errorBanner').hidden = true;
+    const cards = document.querySelectorAll('.provider-card');
+    document.getElementById('docsLink').href = cards[0].dataset.docs;
+}"""
+
+
+@pytest.fixture(scope="class")
+def _step2_shared(browser_context, flask_url):
+    page = browser_context.new_page()
+    page.goto(f"{flask_url}/setup/2")
+    yield page
+    page.close()
+
+
+@pytest.fixture
+def step2_page(_step2_shared):
+    _step2_shared.evaluate(_STEP2_RESET_JS)
+    return _step2_shared
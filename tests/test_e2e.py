@@ -0,0 +1,287 @@
+"""End-to-end tests for the setup wizard, driven through real Chromium.
+
+The wizard runs with PICLAW_TESTING=1, so systemctl/nmcli calls are
+skipped and API keys validate by prefix. Tests inside a class run in
+order and share wizard state (the full-flow test leaves the device set
+up; later tests assert on the configured device).
+"""
+
+import os
+
+import orjson
+import pytest
+from playwright.sync_api import expect
+
+from conftest import (
+    ENV_PATH,
+    EXPECTED_CONFIG_BYTES,
+    SETUP_MARKER,
+    read_config_bytes,
+    shot,
+)
+
+PROVIDER_NAMES = {
+    "Anthropic (Claude)",
+    "OpenAI (GPT)",
+    "Google (Gemini)",
+    "Groq",
+}
+
+
+def _read_and_stat(path):
+    """Read a file's bytes and stat in one open/fstat/read pass.
+
+    A missing file raises FileNotFoundError, which doubles as the
+    existence assertion without a separate stat.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        st = os.fstat(fd)
+        return os.read(fd, st.st_size), st
+    finally:
+        os.close(fd)
+
+
+class TestSetupWizardE2E:
+    def test_root_redirects_to_setup(self, page, flask_url):
+        page.goto(flask_url)
+        page.wait_for_url("**/setup/1")
+        shot(page, "01-redirect-to-setup.png")
+
+    def test_step1_renders_correctly(self, page, flask_url):
+        page.goto(f"{flask_url}/setup/1")
+        # The page is server-rendered, so after goto returns every
+        # element is already in place — snapshot all of it in one
+        # evaluate instead of five expect() round-trips.
+        state = page.evaluate(
+            """() => {
+                const btn = document.querySelector('button[type=submit]');
+                return {
+                    title: document.querySelector('h1').textContent,
+                    devName: document.getElementById('device_name').value,
+                    btnText: btn.textContent.trim(),
+                    btnVisible: !!btn.offsetParent,
+                    dots: document.querySelectorAll('.step-dot').length,
+                    activeDots:
+                        document.querySelectorAll('.step-dot.active').length,
+                };
+            }"""
+        )
+        assert state["title"] == "Welcome to PiClaw 🐾"
+        assert state["devName"] == "piclaw"
+        assert state["btnVisible"]
+        assert state["btnText"] == "Continue →"
+        assert state["dots"] == 3
+        assert state["activeDots"] == 1
+        shot(page, "02-step1-welcome.png")
+
+    def test_step1_to_step2_navigation(self, page, flask_url):
+        page.goto(f"{flask_url}/setup/1")
+        page.fill("#device_name", "test-claw")
+        page.click("button[type=submit]")
+        page.wait_for_url("**/setup/2")
+        expect(page.locator("h1")).to_have_text("Connect your AI provider")
+        shot(page, "03-step2-providers.png")
+
+    def test_step2_shows_all_providers(self, step2_page):
+        # One CDP round-trip for all four names, not one per card —
+        # evaluate skips the locator-resolution layer entirely.
+        names = step2_page.evaluate(
+            "() => Array.from(document.querySelectorAll('.provider-card .name'),"
+            " n => n.textContent.trim())"
+        )
+        assert set(names) == PROVIDER_NAMES
+        shot(step2_page, "04-provider-grid.png")
+
+    def test_step2_provider_selection(self, step2_page):
+        step2_page.click(".provider-card[data-provider=anthropic]")
+        # The click handler mutates the DOM synchronously, so one
+        # snapshot right after the click covers both observations.
+        state = step2_page.evaluate(
+            """() => ({
+                selected: !!document.querySelector(
+                    '.provider-card.selected[data-provider=anthropic]'),
+                keyVisible: !!document.getElementById('api_key').offsetParent,
+            })"""
+        )
+        assert state["selected"]
+        assert state["keyVisible"]
+        shot(step2_page, "05-provider-selected.png")
+
+    def test_step2_docs_link_updates(self, step2_page):
+        # The card handler updates the link synchronously, so both
+        # clicks and both href reads fit in one evaluate.
+        hrefs = step2_page.evaluate(
+            """() => {
+                const link = document.getElementById('docsLink');
+                document.querySelector(
+                    '.provider-card[data-provider=openai]').click();
+                const openai = link.href;
+                document.querySelector(
+                    '.provider-card[data-provider=google]').click();
+                return [openai, link.href];
+            }"""
+        )
+        assert hrefs == [
+            "https://platform.openai.com/api-keys",
+            "https://aistudio.google.com/app/apikey",
+        ]
+
+    def test_full_setup_flow(self, page, flask_url):
+        page.goto(flask_url)
+        page.wait_for_url("**/setup/1")
+        page.fill("#device_name", "test-claw")
+        page.click("button[type=submit]")
+        page.wait_for_url("**/setup/2")
+        page.click(".provider-card[data-provider=anthropic]")
+        page.fill("#api_key", "sk-ant-test12345678")
+        page.click("button[type=submit]")
+        page.wait_for_url("**/setup/3")
+        shot(page, "06-launching.png")
+        # The launching page meta-refreshes to the completion page.
+        page.wait_for_url("**/setup/complete", timeout=10000)
+        # expect() auto-waits for the node; no need to sit out networkidle.
+        expect(page.locator("h1")).to_have_text("You're All Set!")
+        shot(page, "07-all-set.png")
+
+        assert read_config_bytes() == EXPECTED_CONFIG_BYTES
+        env_bytes, env_st = _read_and_stat(ENV_PATH)
+        assert env_st.st_mode & 0o777 == 0o600
+        env_text = env_bytes.decode()
+        assert "PICOCLAW_API_KEY=sk-ant-test12345678" in env_text
+        assert "PICOCLAW_PROVIDER=anthropic" in env_text
+        assert SETUP_MARKER.exists()
+
+    def test_root_redirects_to_dashboard_after_setup(
+        self, page, flask_url, setup_complete
+    ):
+        page.goto(flask_url)
+        page.wait_for_url("**/dashboard")
+        expect(page.locator("h1")).to_have_text("test-claw")
+        shot(page, "08-dashboard.png")
+
+    def test_api_status_endpoint(self, http_session, flask_url, setup_complete):
+        # Response-shape assertion only — skip the browser round-trip.
+        body = orjson.loads(http_session.get(f"{flask_url}/api/status").content)
+        assert body["status"] == "ok"
+        assert body["setup_complete"] is True
+        assert body["device_name"] == "test-claw"
+        assert body["provider"] == "anthropic"
+
+    def test_dashboard_restart_button(self, page, flask_url, setup_complete):
+        page.goto(f"{flask_url}/dashboard")
+        expect(page.locator("#restartBtn")).to_be_visible()
+        page.click("#restartBtn")
+        expect(page.locator("#serviceState")).to_have_text("active")
+
+    def test_wifi_manual_entry_button(self, page, flask_url):
+        page.goto(f"{flask_url}/wifi")
+        manual_ssid = page.locator("#manualSsid")
+        expect(manual_ssid).to_be_hidden()
+        page.click("#manualEntryBtn")
+        expect(manual_ssid).to_be_visible(timeout=2000)
+
+    def test_wifi_connect_api_validation(self, http_session, flask_url):
+        resp = http_session.post(
+            f"{flask_url}/api/wifi/connect",
+            json={"ssid": "", "password": "whatever"},
+        )
+        assert resp.status_code == 400
+        assert resp.json()["success"] is False
+
+    def test_validate_key_api_endpoint(self, http_session, flask_url):
+        good = http_session.post(
+            f"{flask_url}/api/validate-key",
+            json={"provider": "anthropic", "api_key": "sk-ant-test12345678"},
+        )
+        assert good.status_code == 200
+        assert good.json()["valid"] is True
+        bad = http_session.post(
+            f"{flask_url}/api/validate-key",
+            json={"provider": "clippy", "api_key": "x"},
+        )
+        assert bad.status_code == 400
+
+    def test_root_skips_wifi_on_ec2(self, page, flask_url, reset_setup_state):
+        # Fresh device, and off-Pi there is no wlan0 hotspot, so the
+        # wizard must land on step 1, not the WiFi portal.
+        page.goto(flask_url)
+        page.wait_for_url("**/setup/1")
+
+
+class TestErrorHandling:
+    def test_step2_empty_submission_blocked(self, page, flask_url):
+        page.goto(f"{flask_url}/setup/2")
+        page.click("button[type=submit]")
+        banner = page.locator("#errorBanner")
+        expect(banner).to_be_visible(timeout=2000)
+        expect(banner).to_contain_text("Pick a provider")
+
+    def test_step2_empty_key_blocked(self, page, flask_url):
+        page.goto(f"{flask_url}/setup/2")
+        page.click(".provider-card[data-provider=anthropic]")
+        page.click("button[type=submit]")
+        banner = page.locator("#errorBanner")
+        expect(banner).to_be_visible(timeout=2000)
+        expect(banner).to_contain_text("Paste your API key")
+
+    def test_step2_short_key_blocked(self, page, flask_url):
+        page.goto(f"{flask_url}/setup/2")
+        page.click(".provider-card[data-provider=anthropic]")
+        page.fill("#api_key", "abc")
+        page.click("button[type=submit]")
+        banner = page.locator("#errorBanner")
+        expect(banner).to_be_visible(timeout=2000)
+        expect(banner).to_contain_text("too short")
+
+    def test_step2_loading_state_on_submit(self, page, flask_url):
+        page.goto(f"{flask_url}/setup/2")
+        page.click(".provider-card[data-provider=anthropic]")
+        page.fill("#api_key", "sk-ant-test12345678")
+        page.click("button[type=submit]")
+        # The button spinner shows while validation is in flight; after
+        # the form submits, the launching page's spinner takes over.
+        # Matching either keeps the check race-free on fast hosts.
+        expect(page.locator("#btnSpinner, .spinner.big")).to_be_visible(
+            timeout=1000
+        )
+        shot(page, "09-loading-state.png")
+        # Validation passed, so we must end up on the launching page.
+        page.wait_for_url("**/setup/3")
+
+
+VIEWPORTS = [
+    (375, 667, "mobile"),
+    (768, 1024, "tablet"),
+    (1280, 800, "desktop"),
+]
+
+
+class TestMobileResponsiveness:
+    # One page for the whole class: navigate once per step, then only
+    # resize — CSS reflow is all these assertions need.
+    @pytest.fixture(scope="class")
+    def resp_page(self, browser_context):
+        page = browser_context.new_page()
+        yield page
+        page.close()
+
+    def test_step1_responsive(self, resp_page, flask_url):
+        resp_page.goto(f"{flask_url}/setup/1")
+        heading = resp_page.locator("h1")
+        submit = resp_page.locator("button[type=submit]")
+        for width, height, label in VIEWPORTS:
+            resp_page.set_viewport_size({"width": width, "height": height})
+            expect(heading).to_be_visible()
+            expect(submit).to_be_visible()
+            shot(resp_page, f"resp-step1-{label}.png")
+
+    def test_step2_responsive(self, resp_page, flask_url):
+        resp_page.goto(f"{flask_url}/setup/2")
+        heading = resp_page.locator("h1")
+        grid = resp_page.locator(".provider-grid")
+        for width, height, label in VIEWPORTS:
+            resp_page.set_viewport_size({"width": width, "height": height})
+            expect(heading).to_be_visible()
+            expect(grid).to_be_visible()
+            shot(resp_page, f"resp-step2-{label}.png")